@@ -1,6 +1,11 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import time
+from collections import deque
 from datetime import datetime
 
 # ----------------- CONFIG -----------------
@@ -9,6 +14,26 @@ SHEET_NAME = "ExpenseTracker"
 WORKSHEET_NAME = "Transactions"
 CREDENTIALS_FILE = "credentials.json"
 LOCAL_CSV_FILE = "expenses_local.csv"
+COLUMNS = ["Date","Category","Item","Shop","PricePaid","Quantity","QuantityUnit","User"]
+TEXT_COLUMNS = ["Category","Item","Shop","QuantityUnit","User"]
+
+# Arrow-backed strings store bytes contiguously instead of as Python str
+# objects, so hashing/unique run in C. Fall back to object dtype without it.
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = None
+
+# Optional JIT for the trend aggregation on very large histories.
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# Below this many rows the pandas groupby wins (no compile/dispatch cost).
+NUMBA_TREND_THRESHOLD = 5000
 
 # ----------------- STORAGE SETUP -----------------
 if USE_GOOGLE_SHEETS:
@@ -25,118 +50,419 @@ if USE_GOOGLE_SHEETS:
             client = gspread.authorize(creds)
             return client
 
-        client = init_gspread()
-        try:
-            sheet = client.open(SHEET_NAME).worksheet(WORKSHEET_NAME)
-        except gspread.exceptions.WorksheetNotFound:
-            sh = client.open(SHEET_NAME)
-            sheet = sh.add_worksheet(title=WORKSHEET_NAME, rows="1000", cols="10")
-            sheet.append_row(["Date","Category","Item","Shop","PricePaid","Quantity","QuantityUnit","User"])
-
+        @st.cache_resource
+        def get_sheet():
+            client = init_gspread()
+            try:
+                return client.open(SHEET_NAME).worksheet(WORKSHEET_NAME)
+            except gspread.exceptions.WorksheetNotFound:
+                sh = client.open(SHEET_NAME)
+                sheet = sh.add_worksheet(title=WORKSHEET_NAME, rows="1000", cols="10")
+                sheet.append_row(COLUMNS)
+                return sheet
+
+        sheet = get_sheet()
+
+        @st.cache_data(ttl=60, show_spinner=False)
         def load_data():
-            records = sheet.get_all_records()
-            if not records:
-                return pd.DataFrame(columns=["Date","Category","Item","Shop","PricePaid","Quantity","QuantityUnit","User"])
-            return pd.DataFrame(records)
+            # Returns (frame, fetch time). The timestamp lets each session
+            # decide which of its pending rows a fetch already covers; the
+            # cache is shared across sessions, so the body must not touch
+            # session_state.
+            # get_all_values transfers one list-of-lists; dtypes are then
+            # coerced column-wise in C instead of building a dict per row.
+            vals = sheet.get_all_values()
+            if len(vals) < 2:
+                return pd.DataFrame(columns=COLUMNS), time.time()
+            df = pd.DataFrame(vals[1:], columns=vals[0])
+            df["PricePaid"] = pd.to_numeric(df["PricePaid"], errors="coerce",
+                                            downcast="float")
+            df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce",
+                                           downcast="float")
+            df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d",
+                                        cache=True, errors="coerce")
+            # Categorical keys make every downstream groupby hash int codes
+            # instead of Python strings; building the categories from Arrow
+            # strings keeps that step off the Python-object path too.
+            for c in TEXT_COLUMNS:
+                if c in df.columns:
+                    if STRING_DTYPE:
+                        df[c] = df[c].astype(STRING_DTYPE)
+                    df[c] = df[c].astype("category")
+            return df, time.time()
+
+        def _sheet_rows(df):
+            # Column-wise formatting instead of df.astype(str): numerics stay
+            # numeric (JSON-native, missing values become blank cells) and
+            # only the text columns pay a str conversion.
+            def _num(s, decimals):
+                return s.astype("float64").round(decimals).astype(object).where(s.notna(), "")
+
+            return list(map(list, zip(
+                pd.to_datetime(df["Date"], format="%Y-%m-%d", cache=True,
+                               errors="coerce").dt.strftime("%Y-%m-%d").fillna(""),
+                df["Category"].astype(str),
+                df["Item"].astype(str),
+                df["Shop"].astype(str),
+                _num(df["PricePaid"], 2),
+                _num(df["Quantity"], 3),
+                df["QuantityUnit"].astype(str),
+                df["User"].astype(str),
+            )))
 
         def save_data(df):
             sheet.clear()
-            sheet.append_row(df.columns.tolist())
-            sheet.append_rows(df.astype(str).values.tolist())
+            sheet.append_row(COLUMNS)
+            sheet.append_rows(_sheet_rows(df), value_input_option="USER_ENTERED")
+            load_data.clear()
+
+        def append_row_remote(row):
+            # O(1) append instead of rewriting the whole sheet for one new row.
+            # The cached base is left alone; the row rides along in
+            # session_state.pending_rows until the next real fetch.
+            sheet.append_row([str(row[c]) for c in COLUMNS], value_input_option="RAW")
+
+        def update_cells_remote(cells):
+            # Push only the changed cells, as one batch_update.
+            updates = []
+            for idx, col, _, new in cells:
+                if isinstance(new, pd.Timestamp):
+                    new = new.strftime("%Y-%m-%d")
+                # Sheet row = dataframe position + 1 header row + 1-based offset
+                a1 = gspread.utils.rowcol_to_a1(int(idx) + 2, COLUMNS.index(col) + 1)
+                updates.append({"range": a1, "values": [[str(new)]]})
+            if updates:
+                sheet.batch_update(updates, value_input_option="RAW")
+                load_data.clear()
+
+        def delete_row_remote(sheet_row):
+            # Remove one persisted row (1-based sheet index, header row = 1).
+            sheet.delete_rows(sheet_row)
+            load_data.clear()
 
     except Exception as e:
         st.warning(f"Google Sheets not available ({e}). Using local CSV fallback.")
         USE_GOOGLE_SHEETS = False
 
 if not USE_GOOGLE_SHEETS:
+    @st.cache_data(ttl=60, show_spinner=False)
     def load_data():
+        # Returns (frame, fetch time); see the Sheets variant.
         try:
-            return pd.read_csv(LOCAL_CSV_FILE, parse_dates=["Date"])
+            df = pd.read_csv(LOCAL_CSV_FILE, parse_dates=["Date"],
+                             date_format="%Y-%m-%d")
         except FileNotFoundError:
-            return pd.DataFrame(columns=["Date","Category","Item","Shop","PricePaid","Quantity","QuantityUnit","User"])
+            return pd.DataFrame(columns=COLUMNS), time.time()
+        df["PricePaid"] = pd.to_numeric(df["PricePaid"], errors="coerce",
+                                        downcast="float")
+        df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce",
+                                       downcast="float")
+        for c in TEXT_COLUMNS:
+            if c in df.columns:
+                if STRING_DTYPE:
+                    df[c] = df[c].astype(STRING_DTYPE)
+                df[c] = df[c].astype("category")
+        return df, time.time()
 
     def save_data(df):
-        df.to_csv(LOCAL_CSV_FILE, index=False)
+        out = df.copy()
+        # Round away float32 noise (10.91 -> 10.90999984741211) before it
+        # reaches the file; mirrors _num() on the Sheets path.
+        out["PricePaid"] = out["PricePaid"].astype("float64").round(2)
+        out["Quantity"] = out["Quantity"].astype("float64").round(3)
+        out.to_csv(LOCAL_CSV_FILE, index=False, date_format="%Y-%m-%d")
+        load_data.clear()
+
+    def append_row_remote(row):
+        # Parse the new row's Date so the concat stays datetime64 instead of
+        # degrading to object and round-tripping "... 00:00:00" strings.
+        new_df = pd.DataFrame([row])
+        new_df["Date"] = pd.to_datetime(new_df["Date"], format="%Y-%m-%d")
+        base, _ = load_data()
+        save_data(pd.concat([base, new_df], ignore_index=True))
+
+    def update_cells_remote(cells):
+        df, _ = load_data()
+        for idx, col, _, new in cells:
+            df.loc[idx, col] = new
+        save_data(df)
+
+    def delete_row_remote(sheet_row):
+        # Same 1-based sheet-row convention as the Sheets backend.
+        df, _ = load_data()
+        save_data(df.drop(index=sheet_row - 2).reset_index(drop=True))
+
+# ----------------- DERIVED DATA -----------------
+@st.cache_data(show_spinner=False)
+def augment_dates(_df, fingerprint):
+    # _df is excluded from hashing; `fingerprint` (row count + max Date) is a
+    # cheap cache key so the datetime parse runs only when the data changes.
+    out = _df.copy()
+    out["Date"] = pd.to_datetime(out["Date"], format="%Y-%m-%d", cache=True,
+                                 errors="coerce")
+    # Legacy/hand-edited rows that don't match the format become NaT; drop
+    # them here (with a visible warning) instead of crashing the int casts.
+    bad_dates = out["Date"].isna()
+    if bad_dates.any():
+        st.warning(f"Ignoring {int(bad_dates.sum())} row(s) with dates not in "
+                   f"YYYY-MM-DD format.")
+        out = out[~bad_dates].copy()
+    out["Year"] = out["Date"].dt.year.astype("int16")
+    out["MonthNum"] = out["Date"].dt.month.astype("int8")
+    out["Month"] = out["Date"].dt.strftime("%B").astype("category")
+    price = out["PricePaid"].to_numpy(dtype="float32")
+    qty = out["Quantity"].to_numpy(dtype="float32")
+    out["PricePerUnit"] = price / np.where(qty == 0, 1.0, qty)
+    # Kept as Period (int64 ordinals under the hood); only the final trend
+    # axis labels are stringified after aggregation.
+    out["YearMonth"] = out["Date"].dt.to_period("M")
+    return out
+
+def date_fingerprint(df):
+    # data_version catches mutations that preserve both row count and max
+    # Date (e.g. a saved PricePaid edit), which the shape-based key misses.
+    return (st.session_state.data_version, len(df),
+            str(df["Date"].max()) if len(df) else "")
+
+@st.cache_data(show_spinner=False)
+def build_summaries(_df, fingerprint):
+    # pivot_table aggregates every (year, month, key) group in one cython
+    # pass; the render loops then take O(1) MultiIndex slices. Cached on the
+    # same cheap fingerprint as augment_dates.
+    per_item = _df.pivot_table(index=["Year", "MonthNum", "Month", "Item"],
+                               values="PricePaid", aggfunc="sum",
+                               observed=True)["PricePaid"]
+    per_cat = _df.pivot_table(index=["Year", "MonthNum", "Month", "Category"],
+                              values="PricePaid", aggfunc="sum",
+                              observed=True)["PricePaid"]
+    year_item = per_item.groupby(level=["Year", "Item"], observed=True).sum()
+    year_cat = per_cat.groupby(level=["Year", "Category"], observed=True).sum()
+    year_totals = per_cat.groupby(level="Year").sum()
+    return per_item, per_cat, year_item, year_cat, year_totals
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _group_mean(codes, values, n_groups):
+        # One pass over contiguous arrays, no Python per-row overhead.
+        # Deliberately sequential: a parallel prange would race on the
+        # scattered += updates.
+        sums = np.zeros(n_groups, np.float64)
+        counts = np.zeros(n_groups, np.int64)
+        for i in range(codes.size):
+            sums[codes[i]] += values[i]
+            counts[codes[i]] += 1
+        return sums / np.maximum(counts, 1)
+
+# The figure builder takes small hashable tuples (not DataFrames) so unchanged
+# slices return the cached Figure instead of re-running the plotly pipeline.
+# Pie + bar share one subplot figure: one plotly.js instance and one JSON
+# payload per slot instead of two.
+@st.cache_data(show_spinner=False)
+def make_breakdown(cat_names, cat_values, item_names, item_values, title):
+    fig = make_subplots(rows=1, cols=2,
+                        specs=[[{"type": "domain"}, {"type": "xy"}]],
+                        subplot_titles=("Category Split", "Item Breakdown"))
+    fig.add_trace(go.Pie(labels=list(cat_names), values=list(cat_values)),
+                  row=1, col=1)
+    fig.add_trace(go.Bar(x=list(item_names), y=list(item_values),
+                         showlegend=False),
+                  row=1, col=2)
+    fig.update_layout(title_text=title, uirevision="constant")
+    return fig
 
 # ----------------- SESSION STATE -----------------
+if "pending_rows" not in st.session_state:
+    st.session_state.pending_rows = []
+if "data_version" not in st.session_state:
+    # Bumped on every mutation; part of the derived-data cache fingerprints.
+    st.session_state.data_version = 0
 if "history" not in st.session_state:
-    st.session_state.history = []
+    # Delta log: each entry records the changed cells (or the added row),
+    # not a full DataFrame copy, so memory per entry is O(changes).
+    st.session_state.history = deque(maxlen=50)
 if "redo_stack" not in st.session_state:
     st.session_state.redo_stack = []
 
-def save_state():
-    st.session_state.history.append(st.session_state.df.copy())
+def diff_cells(baseline, edited):
+    """List of (row_label, column, old, new) for every cell that changed."""
+    diff = edited.compare(baseline)
+    cells = []
+    for idx in diff.index:
+        for col in {c for c, _ in diff.columns}:
+            old, new = baseline.at[idx, col], edited.at[idx, col]
+            if old == new or (pd.isna(old) and pd.isna(new)):
+                continue
+            cells.append((idx, col, old, new))
+    return cells
+
+def record_op(op):
+    st.session_state.history.append(op)
     st.session_state.redo_stack.clear()
 
+def _apply_op(op, inverse):
+    st.session_state.data_version += 1
+    if op["kind"] == "edit":
+        # Replay against the store too, so undo/redo can't diverge from it.
+        if inverse:
+            update_cells_remote([(idx, col, new, old)
+                                 for idx, col, old, new in op["cells"]])
+        else:
+            update_cells_remote(op["cells"])
+        for key in ("df_full", "user_df_raw", "user_df_aug"):
+            frame = st.session_state.get(key)
+            if frame is None:
+                continue
+            frame = frame.copy()
+            for idx, col, old, new in op["cells"]:
+                if idx in frame.index and col in frame.columns:
+                    frame.loc[idx, col] = old if inverse else new
+            st.session_state[key] = frame
+    elif op["kind"] == "add":
+        if inverse:
+            # Ops are applied LIFO, so the undone add is the last persisted
+            # row; delete it remotely before trimming the session frames.
+            delete_row_remote(len(st.session_state.df_full) + 1)
+            st.session_state.pending_rows = [
+                p for p in st.session_state.pending_rows
+                if p["row"] is not op["row"]]
+            for key in ("df_full", "user_df_raw", "user_df_aug"):
+                frame = st.session_state.get(key)
+                if frame is not None and len(frame):
+                    st.session_state[key] = frame.iloc[:-1]
+        else:
+            # The undo deleted the row remotely, so append it again and
+            # rebuild right away rather than waiting for the next interaction.
+            append_row_remote(op["row"])
+            st.session_state.pending_rows.append(
+                {"row": op["row"], "added_at": time.time()})
+            st.session_state.dirty = True
+            st.rerun(scope="app")
+
 def undo():
     if st.session_state.history:
-        st.session_state.redo_stack.append(st.session_state.df.copy())
-        st.session_state.df = st.session_state.history.pop()
+        op = st.session_state.history.pop()
+        st.session_state.redo_stack.append(op)
+        _apply_op(op, inverse=True)
 
 def redo():
     if st.session_state.redo_stack:
-        st.session_state.history.append(st.session_state.df.copy())
-        st.session_state.df = st.session_state.redo_stack.pop()
+        op = st.session_state.redo_stack.pop()
+        st.session_state.history.append(op)
+        _apply_op(op, inverse=False)
 
 # ----------------- USER LOGIN -----------------
 st.sidebar.header("👤 User Login")
-username = st.sidebar.text_input("Enter your name", value="User1").strip()
+username = st.sidebar.text_input("Enter your name", value="User1", key="username").strip()
 if username == "":
     st.warning("Please enter your username to continue.")
     st.stop()
 
 # ----------------- LOAD DATA -----------------
-df = load_data()
-if "User" not in df.columns:
-    df["User"] = "User1"
-
-# Filter only current user's data
-user_df = df[df["User"] == username].copy()
-st.session_state.df = user_df
+# The full, per-user and augmented frames live in session_state and are only
+# rebuilt when a mutation marks them dirty or the user changes. Non-mutating
+# reruns (keystrokes, toggles, selectboxes) do zero pandas work here.
+if ("df_full" not in st.session_state
+        or st.session_state.pop("dirty", False)
+        or st.session_state.get("data_user") != username):
+    df, fetched_at = load_data()
+    # A fetch newer than a pending row's append already contains that row
+    # (appends hit the store immediately), so drop the covered entries —
+    # per session, since the load cache is shared across sessions.
+    st.session_state.pending_rows = [
+        p for p in st.session_state.pending_rows if p["added_at"] > fetched_at]
+    # Overlay rows added this session that the cached base doesn't include
+    # yet: one concat per refresh instead of one per add.
+    if st.session_state.pending_rows:
+        pending_df = pd.DataFrame([p["row"] for p in st.session_state.pending_rows])
+        pending_df["Date"] = pd.to_datetime(pending_df["Date"], format="%Y-%m-%d")
+        df = pd.concat([df, pending_df], ignore_index=True)
+    if "User" not in df.columns:
+        df["User"] = pd.Categorical(["User1"] * len(df))
+
+    # Filter only current user's data. With a Categorical User column this is
+    # an int8 code comparison instead of a per-row string compare; no .copy()
+    # since downstream consumers never mutate it in place.
+    if isinstance(df["User"].dtype, pd.CategoricalDtype):
+        user_cats = df["User"].cat.categories
+        if username in user_cats:
+            user_df = df[df["User"].cat.codes.to_numpy() == user_cats.get_loc(username)]
+        else:
+            user_df = df.iloc[0:0]
+    else:
+        # Object fallback (empty frame or pending-row overlay concat).
+        user_df = df[df["User"] == username]
+
+    st.session_state.df_full = df
+    st.session_state.user_df_raw = user_df
+    st.session_state.user_df_aug = (
+        augment_dates(user_df, (username, *date_fingerprint(user_df)))
+        if not user_df.empty else user_df
+    )
+    st.session_state.data_user = username
+    # Widget option lists are snapshotted here too, so the sidebar doesn't
+    # rescan full columns on every keystroke rerun.
+    st.session_state.cat_options = user_df["Category"].dropna().unique().tolist()
+    st.session_state.unit_options = user_df["QuantityUnit"].dropna().unique().tolist()
+    st.session_state.item_options = user_df["Item"].dropna().unique().tolist()
+
+df = st.session_state.df_full
+user_df = st.session_state.user_df_raw
 
 # ----------------- ADD NEW EXPENSE -----------------
-st.sidebar.header(f"➕ Add Expense ({username})")
-date = st.sidebar.date_input("Date", datetime.today())
-categories = user_df["Category"].unique().tolist()
-category = st.sidebar.text_input("Category (new or existing)")
-if category == "" and categories:
-    category = st.sidebar.selectbox("Or select existing Category", categories)
-
-item = st.sidebar.text_input("Item")
-shop = st.sidebar.text_input("Shop")
-
-# Units
-units = user_df["QuantityUnit"].unique().tolist()
-default_units = ["Kg", "Liter", "Count"]
-all_units = sorted(set(default_units + units))
-unit = st.sidebar.selectbox("Quantity Unit", all_units)
-new_unit = st.sidebar.text_input("Or add new Unit")
-if new_unit:
-    unit = new_unit
-
-# Quantity input with precision
-if unit.lower() in ["kg", "liter"]:
-    quantity = st.sidebar.number_input("Quantity", min_value=0.0, format="%.3f")
-else:
-    quantity = st.sidebar.number_input("Quantity", min_value=0, step=1, format="%d")
-
-# Price Paid
-price = st.sidebar.number_input("Price Paid", min_value=0.0, format="%.2f")
-
-if st.sidebar.button("Add Expense"):
-    new_row = {
-        "Date": pd.to_datetime(date).strftime("%Y-%m-%d"),
-        "Category": category if category else "Uncategorized",
-        "Item": item,
-        "Shop": shop,
-        "PricePaid": price,
-        "Quantity": quantity,
-        "QuantityUnit": unit,
-        "User": username
-    }
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    save_data(df)
-    st.success(f"Expense Added for {username} ✅")
+@st.fragment
+def add_expense_sidebar():
+    # Typing in these widgets reruns only this fragment; the groupby and
+    # chart sections don't re-execute until data actually changes.
+    user = st.session_state.username.strip()
+    st.sidebar.header(f"➕ Add Expense ({user})")
+    date = st.sidebar.date_input("Date", datetime.today())
+    categories = st.session_state.cat_options
+    category = st.sidebar.text_input("Category (new or existing)")
+    if category == "" and categories:
+        category = st.sidebar.selectbox("Or select existing Category", categories)
+
+    item = st.sidebar.text_input("Item")
+    shop = st.sidebar.text_input("Shop")
+
+    # Units
+    units = st.session_state.unit_options
+    default_units = ["Kg", "Liter", "Count"]
+    all_units = sorted(set(default_units + units))
+    unit = st.sidebar.selectbox("Quantity Unit", all_units)
+    new_unit = st.sidebar.text_input("Or add new Unit")
+    if new_unit:
+        unit = new_unit
+
+    # Quantity input with precision
+    if unit.lower() in ["kg", "liter"]:
+        quantity = st.sidebar.number_input("Quantity", min_value=0.0, format="%.3f")
+    else:
+        quantity = st.sidebar.number_input("Quantity", min_value=0, step=1, format="%d")
+
+    # Price Paid
+    price = st.sidebar.number_input("Price Paid", min_value=0.0, format="%.2f")
+
+    if st.sidebar.button("Add Expense"):
+        new_row = {
+            "Date": date.strftime("%Y-%m-%d"),
+            "Category": category if category else "Uncategorized",
+            "Item": item,
+            "Shop": shop,
+            "PricePaid": price,
+            "Quantity": quantity,
+            "QuantityUnit": unit,
+            "User": user
+        }
+        st.session_state.pending_rows.append(
+            {"row": new_row, "added_at": time.time()})
+        append_row_remote(new_row)
+        record_op({"kind": "add", "row": new_row})
+        st.session_state.data_version += 1
+        st.session_state.dirty = True
+        st.toast(f"Expense Added for {user} ✅")
+        st.rerun(scope="app")
+
+add_expense_sidebar()
 
 # ----------------- UNDO / REDO -----------------
 col1, col2 = st.columns(2)
@@ -146,77 +472,118 @@ with col1:
 with col2:
     if st.button("↪️ Redo"):
         redo()
+# undo/redo swap the session frames in place; rebind so the editor below
+# renders the same dataset the fragments read on this rerun.
+df = st.session_state.df_full
+user_df = st.session_state.user_df_raw
 
 # ----------------- EDITABLE TABLE -----------------
 st.subheader(f"📋 Transactions Table ({username})")
 if not user_df.empty:
     edited_user_df = st.data_editor(user_df, num_rows="dynamic", use_container_width=True)
     if st.button("💾 Save Changes"):
-        # Merge edited user data back into full sheet
-        df = df[df["User"] != username]
-        df = pd.concat([df, edited_user_df], ignore_index=True)
-        save_data(df)
-        st.success("Saved successfully ✅")
-        user_df = edited_user_df
+        if edited_user_df.index.equals(user_df.index):
+            # Cell edits only: push just the changed cells.
+            cells = diff_cells(user_df, edited_user_df)
+            if cells:
+                update_cells_remote(cells)
+                record_op({"kind": "edit", "cells": cells})
+        else:
+            # Rows were added/removed in the editor: rewrite the full sheet.
+            df = df[df["User"] != username]
+            df = pd.concat([df, edited_user_df], ignore_index=True)
+            save_data(df)
+        st.session_state.data_version += 1
+        st.session_state.dirty = True
+        st.toast("Saved successfully ✅")
+        st.rerun(scope="app")
 
 # ----------------- YEAR / MONTH SUMMARY -----------------
-st.subheader("📅 Expenses by Year → Month")
-if not user_df.empty:
-    user_df["Date"] = pd.to_datetime(user_df["Date"])
-    user_df["Year"] = user_df["Date"].dt.year
-    user_df["Month"] = user_df["Date"].dt.strftime("%B")
-    user_df["MonthNum"] = user_df["Date"].dt.month
-
-    for year, year_df in user_df.groupby("Year"):
+@st.fragment
+def render_summary():
+    # Chart toggles and expander clicks rerun only this fragment.
+    st.subheader("📅 Expenses by Year → Month")
+    user_df = st.session_state.user_df_aug
+    if user_df.empty:
+        return
+
+    per_item, per_cat, year_item, year_cat, year_totals = build_summaries(
+        user_df, (st.session_state.data_user, *date_fingerprint(user_df)))
+    month_rows = user_df.groupby(["Year", "MonthNum"], sort=True, observed=True)
+
+    for year in year_totals.index:
         with st.expander(f"📆 {year}", expanded=False):
-            total_year = year_df["PricePaid"].sum()
+            total_year = year_totals.loc[year]
             st.markdown(f"### 🏆 Total Spent in {year}: `${total_year:,.2f}`")
 
-            year_cat_pie = px.pie(year_df, names="Category", values="PricePaid", title=f"Category Split - {year}")
-            st.plotly_chart(year_cat_pie, use_container_width=True)
-
-            year_item_bar = px.bar(
-                year_df.groupby("Item")["PricePaid"].sum().reset_index(),
-                x="Item", y="PricePaid", title=f"Item Breakdown - {year}"
-            )
-            st.plotly_chart(year_item_bar, use_container_width=True)
+            # Expanders don't expose their open/closed state, so gate the
+            # figure construction behind a toggle: charts are only built
+            # (and JSON-serialized to the browser) when actually requested.
+            if st.toggle("📊 Show charts", key=f"charts_{year}"):
+                ycat = year_cat.loc[year]
+                yitem = year_item.loc[year]
+                year_fig = make_breakdown(
+                    tuple(ycat.index), tuple(ycat.to_numpy()),
+                    tuple(yitem.index), tuple(yitem.to_numpy()),
+                    f"Breakdown - {year}")
+                st.plotly_chart(year_fig, use_container_width=True)
 
             # Monthly Breakdown
-            for month, month_df in year_df.groupby(["MonthNum", "Month"]):
-                month_num, month_name = month
+            months = per_item.loc[year].index.droplevel("Item").unique()
+            for month_num, month_name in months:
                 with st.expander(f"🗓️ {month_name} {year}", expanded=False):
-                    total_month = month_df["PricePaid"].sum()
+                    month_cats = per_cat.loc[(year, month_num, month_name)]
+                    month_items = per_item.loc[(year, month_num, month_name)]
+                    total_month = month_cats.sum()
                     st.markdown(f"**Total Spent in {month_name} {year}:** `${total_month:,.2f}`")
 
-                    cat_pie = px.pie(month_df, names="Category", values="PricePaid",
-                                     title=f"Category Split - {month_name} {year}")
-                    st.plotly_chart(cat_pie, use_container_width=True)
-
-                    item_bar = px.bar(
-                        month_df.groupby("Item")["PricePaid"].sum().reset_index(),
-                        x="Item", y="PricePaid",
-                        title=f"Item Breakdown - {month_name} {year}"
-                    )
-                    st.plotly_chart(item_bar, use_container_width=True)
+                    if st.toggle("📊 Show charts", key=f"charts_{year}_{month_num}"):
+                        month_fig = make_breakdown(
+                            tuple(month_cats.index), tuple(month_cats.to_numpy()),
+                            tuple(month_items.index), tuple(month_items.to_numpy()),
+                            f"Breakdown - {month_name} {year}")
+                        st.plotly_chart(month_fig, use_container_width=True)
 
                     with st.expander("📋 Show Transactions"):
-                        st.dataframe(month_df.drop(columns=["Year", "Month", "MonthNum"]))
+                        st.dataframe(month_rows.get_group((year, month_num))
+                                     .drop(columns=["Year", "Month", "MonthNum",
+                                                    "PricePerUnit", "YearMonth"]))
+
+render_summary()
 
 # ----------------- MULTI-YEAR PRICE TREND -----------------
-st.subheader("📈 Multi-Year Price Trend per Item")
-if not user_df.empty:
-    user_df["PricePaid"] = user_df["PricePaid"].astype(float)
-    user_df["Quantity"] = user_df["Quantity"].replace(0, 1).astype(float)
-    user_df["PricePerUnit"] = user_df["PricePaid"] / user_df["Quantity"]
-    item_options = user_df["Item"].unique().tolist()
+@st.fragment
+def render_trend():
+    # Switching items reruns only this fragment.
+    st.subheader("📈 Multi-Year Price Trend per Item")
+    user_df = st.session_state.user_df_aug
+    if user_df.empty:
+        return
+    item_options = st.session_state.item_options
     selected_item = st.selectbox("🔎 Select an Item to view trend:", item_options)
 
     if selected_item:
-        item_df = user_df[user_df["Item"] == selected_item].copy()
-        item_df["YearMonth"] = item_df["Date"].dt.to_period("M").astype(str)
-        trend_df = item_df.groupby("YearMonth")["PricePerUnit"].mean().reset_index()
+        # PricePerUnit and YearMonth come precomputed from augment_dates;
+        # only the selected item's rows are touched here.
+        item_df = user_df.loc[user_df["Item"].eq(selected_item),
+                              ["YearMonth", "PricePerUnit"]]
+        # Group on the Period column (int64 hash path), then stringify just
+        # the few axis labels that survive aggregation.
+        if HAVE_NUMBA and len(item_df) >= NUMBA_TREND_THRESHOLD:
+            codes, periods = pd.factorize(item_df["YearMonth"], sort=True)
+            means = _group_mean(codes.astype(np.int64),
+                                item_df["PricePerUnit"].to_numpy(np.float64),
+                                len(periods))
+            trend = pd.Series(means, index=periods, name="PricePerUnit")
+        else:
+            trend = item_df.groupby("YearMonth", sort=True,
+                                    observed=True)["PricePerUnit"].mean()
+        trend.index = trend.index.astype(str)
+        trend_df = trend.rename_axis("YearMonth").reset_index()
 
         trend_line = px.line(trend_df, x="YearMonth", y="PricePerUnit",
                              title=f"📊 Price Trend for {selected_item}", markers=True)
         trend_line.update_layout(xaxis_title="Year-Month", yaxis_title="Avg Price per Unit")
         st.plotly_chart(trend_line, use_container_width=True)
+
+render_trend()